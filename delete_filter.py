@@ -1,23 +1,29 @@
+import os
+import shutil
+import tempfile
+
+
 def remove_keyword_from_file(keywords_path, keyword_to_remove):
     """
     从敏感词库文件中删除整行只有指定词的行，并将修改后的内容写回文件。
+    逐行写入同目录下的临时文件，完成后原子替换原文件，中途失败不会损坏词库。
     :param keywords_path: 敏感词库文件的路径
     :param keyword_to_remove: 需要删除的敏感词（整行只有该词时才删除）
     """
-    new_keywords = []
-
-    # 打开敏感词文件并逐行读取
-    with open(keywords_path, 'r', encoding='utf-8') as file:
-        for line in file:
-            keyword = line.strip()  # 去掉行首和行尾的空白符和换行符
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(keywords_path)))
+    try:
+        # 打开敏感词文件并逐行读取，边读边写，不在内存中保留整个词库
+        with os.fdopen(fd, 'w', encoding='utf-8') as out, \
+                open(keywords_path, 'r', encoding='utf-8') as file:
+            keywords = (line.strip() for line in file)  # 去掉行首和行尾的空白符和换行符
             # 只有当整行等于 keyword_to_remove 时，才跳过该行
-            if keyword != keyword_to_remove:
-                new_keywords.append(keyword)  # 保留其他敏感词
+            out.writelines(keyword + '\n' for keyword in keywords if keyword != keyword_to_remove)
 
-    # 将修改后的敏感词库写回文件
-    with open(keywords_path, 'w', encoding='utf-8') as file:
-        for keyword in new_keywords:
-            file.write(keyword + '\n')  # 每个敏感词写入一行
+        shutil.copymode(keywords_path, tmp_path)  # 保留原文件的权限
+        os.replace(tmp_path, keywords_path)  # 原子替换原词库文件
+    except BaseException:
+        os.remove(tmp_path)
+        raise
 
     print(f"整行包含敏感词'{keyword_to_remove}'的行已从 {keywords_path} 中删除。")
 
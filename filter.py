@@ -1,104 +1,449 @@
 import ahocorasick
+import functools
+import glob
+import logging
 import os
+import re
+import time
+from typing import Collection, Union
+
+import numpy as np
+
+try:
+    import re2 as regex  # 可选依赖：Google RE2，线性时间的多模式匹配
+except ImportError:
+    regex = re
+
+logger = logging.getLogger(__name__)
 
 # 全局变量，指定敏感词库文件的路径
 keyword_path: str = os.getenv("KEYWORD_PATH", "./keywords.txt")
 
+# 检查敏感词库文件是否被修改的最小间隔（秒），间隔内的请求复用上一次 stat 的结果
+keyword_check_interval: float = float(os.getenv("KEYWORD_CHECK_INTERVAL", "1"))
+
+_keyword_stat: tuple[str, float, int] | None = None  # 最近一次检查的 (词库路径, 检查时刻, mtime)
+
+def _load_keywords(path: str) -> list[str]:
+    """
+    读取敏感词库文件，返回去除空白、转为小写后的非空敏感词列表。
+    整个文件一次性读入、解码并转为小写后再按行切分，避免逐行解码和分配。
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"敏感词库文件未找到: {path}")
+
+    with open(path, 'rb') as file:
+        data = file.read()
+
+    keywords = (line.strip() for line in data.decode('utf-8').lower().splitlines())
+    return [keyword for keyword in keywords if keyword]
+
+def _lower(message: str) -> str:
+    """
+    将消息转换为小写，并保证结果与原文逐字符对齐，命中位置可直接用于原文。
+    绝大多数文本（包括全部 ASCII 文本）小写后长度不变，只做一次 lower()；
+    个别字符（如 'İ'）小写后会变成多个字符，此时逐字符处理并保留这类字符的原样。
+    """
+    message_lower = message.lower()
+    if len(message_lower) == len(message):
+        return message_lower
+    return ''.join(low if len(low) == 1 else ch for ch, low in ((ch, ch.lower()) for ch in message))
+
+def _reject_payload(data: bytes) -> object:
+    """自动机快照的反序列化函数：STORE_LENGTH 自动机不存储 Python 对象，不应被调用"""
+    raise ValueError("自动机快照中不应包含 Python 对象")
+
+def _repl_table(repl: str, size: int = 64) -> dict[int, str]:
+    """预先生成长度 1..size-1 的替换串，命中时直接查表而不是每次重复拼接"""
+    return {length: repl * length for length in range(1, size)}
+
+def _merge_span(spans: list[tuple[int, int]], start_index: int, end_index: int) -> None:
+    """
+    将命中区间 [start, end) 并入 spans，与末尾重叠或相邻的区间会被合并。
+    命中需按结束位置递增给出，spans 因此始终按起点递增且互不重叠。
+    """
+    while spans and spans[-1][1] >= start_index:
+        start, end = spans.pop()
+        start_index = min(start_index, start)
+        end_index = max(end_index, end)
+    spans.append((start_index, end_index))
+
+def _mask_spans(message: str, spans: list[tuple[int, int]], repl: str, repl_cache: dict[int, str]) -> str:
+    """
+    按命中区间一次拼接生成过滤结果：区间外保留原文，区间内每个字符替换为 repl。
+    spans 为按起点递增、互不重叠的 [start, end) 区间列表，
+    repl_cache 为 _repl_table 生成的替换串表，超出表长的区间现场生成。
+    """
+    parts = []
+    cursor = 0
+    for start_index, end_index in spans:
+        length = end_index - start_index
+        parts.append(message[cursor:start_index])
+        parts.append(repl_cache[length] if length in repl_cache else repl * length)
+        cursor = end_index
+    parts.append(message[cursor:])
+    return ''.join(parts)
+
+class BigramPrefilter:
+    """
+    基于敏感词前两个字符的布隆过滤器，对整段文本做一次 numpy 向量化预检。
+    文本中没有任何敏感词的前两个字符组合时一定不含敏感词，可以跳过逐字符的匹配扫描。
+    """
+
+    BITS = 1 << 16  # 布隆位图大小
+    MIN_LENGTH = 256  # 短于该长度的文本直接扫描更快，不做预检
+
+    def __init__(self, keywords: Collection[str]) -> None:
+        """
+        根据敏感词列表构建位图；存在单字敏感词时无法按二元组预检，预检始终放行。
+
+        >>> BigramPrefilter(['暴乳', '毒']).may_contain('有毒' * 200)
+        True
+        >>> BigramPrefilter(['暴乳']).may_contain('有毒' * 200)
+        False
+        """
+        self.bigrams = {keyword[:2] for keyword in keywords}
+        self.enabled = all(len(keyword) >= 2 for keyword in keywords)
+        self.bloom = np.zeros(self.BITS, dtype=np.bool_)
+        if not self.enabled:
+            return
+        for bigram in self.bigrams:
+            self.bloom[self._hash(ord(bigram[0]), ord(bigram[1]))] = True
+
+    def _hash(self, first: int, second: int) -> int:
+        """二元组哈希，与 may_contain 中的向量化计算保持一致（uint32 溢出不影响低 16 位）"""
+        return ((first * 0x9E3779B1) ^ second) & (self.BITS - 1)
+
+    def may_contain(self, message_lower: str) -> bool:
+        """返回 False 表示文本一定不含敏感词；返回 True 时仍需完整扫描"""
+        if not self.enabled or len(message_lower) < self.MIN_LENGTH:
+            return True
+
+        codepoints = np.frombuffer(message_lower.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+        hashes = ((codepoints[:-1] * np.uint32(0x9E3779B1)) ^ codepoints[1:]) & np.uint32(self.BITS - 1)
+        # 位图命中的位置再用集合精确确认，排除布隆过滤器的误报
+        candidates = np.flatnonzero(self.bloom[hashes]).tolist()
+        return any(message_lower[index:index + 2] in self.bigrams for index in candidates)
+
+
 class ACAutomaton:
     """基于 ahocorasick 自动机的敏感词过滤器"""
 
-    def __init__(self, repl="*"):
+    def __init__(self, repl: str = "*", keywords_path: str | None = None) -> None:
         """
         初始化过滤器:
         - repl: 用于替换敏感词的符号，默认为 '*'
+        - keywords_path: 敏感词库文件路径，默认为全局的 keyword_path
         """
         self.repl = repl  # 替换符号
-        self.automaton = ahocorasick.Automaton()  # 初始化 Aho-Corasick 自动机
+        self.keywords_path = keywords_path or keyword_path  # 敏感词库路径
+        self.repl_cache = _repl_table(repl)  # 预生成的替换串，供 _mask_spans 查表
+        # 初始化 Aho-Corasick 自动机，节点只保存敏感词长度，命中的词直接从消息中切出
+        self.automaton = ahocorasick.Automaton(ahocorasick.STORE_LENGTH)
         self.build_automaton()  # 构建自动机
 
-    def build_automaton(self):
-        """从文件中加载敏感词库并构建 Aho-Corasick 自动机"""
-        if not os.path.exists(keyword_path):
-            raise FileNotFoundError(f"敏感词库文件未找到: {keyword_path}")
+    def build_automaton(self) -> None:
+        """从文件中加载敏感词库并构建 Aho-Corasick 自动机，词库未变化时直接载入快照"""
+        snapshot_path = self._snapshot_path()  # 自动机快照文件路径
+        automaton = self._load_snapshot(snapshot_path)
+        if automaton is not None:
+            self.automaton = automaton
+            keywords = list(automaton.keys())
+        else:
+            keywords = _load_keywords(self.keywords_path)
+            for keyword in keywords:
+                self.automaton.add_word(keyword)
+            self.automaton.make_automaton()  # 构建自动机
+            self._save_snapshot(snapshot_path)
+
+        self.prefilter = BigramPrefilter(keywords)  # 无命中文本的快速预检
+        self.max_length = self.automaton.get_stats()['longest_word']  # 最长敏感词的长度
+
+    def _snapshot_path(self) -> str:
+        """
+        返回与当前词库文件对应的快照路径，文件名中记录词库的 mtime 与大小。
+        两者与词库文件完全一致时才会复用快照，词库被替换为 mtime 更早的文件时同样会重新构建。
+        """
+        try:
+            stat = os.stat(self.keywords_path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"敏感词库文件未找到: {self.keywords_path}")
+        return f"{self.keywords_path}.{stat.st_mtime_ns}-{stat.st_size}.ac"
+
+    def _load_snapshot(self, snapshot_path: str) -> ahocorasick.Automaton | None:
+        """快照存在时载入并返回自动机，否则返回 None"""
+        try:
+            # STORE_LENGTH 快照中不含 Python 对象，拒绝反序列化任何载荷
+            automaton = ahocorasick.load(snapshot_path, _reject_payload)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning("自动机快照载入失败，重新构建: %s", e)
+            return None
+        if automaton.store != ahocorasick.STORE_LENGTH:
+            return None
+        return automaton
 
-        # 从文件中加载敏感词库
-        with open(keyword_path, 'r', encoding='utf-8') as file:
-            for line in file:
-                keyword = line.strip().lower()
-                if keyword:  # 如果该行不是空的，则添加到自动机
-                    self.automaton.add_word(keyword, keyword)
+    def _save_snapshot(self, snapshot_path: str) -> None:
+        """将构建好的自动机写入快照，先写临时文件再原子替换，失败时仅记录日志"""
+        tmp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+        try:
+            self.automaton.save(tmp_path)
+            os.replace(tmp_path, snapshot_path)
+        except Exception as e:
+            logger.warning("自动机快照保存失败: %s", e)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
 
-        self.automaton.make_automaton()  # 构建自动机
+        # 清理旧版本词库留下的快照
+        for path in glob.glob(glob.escape(self.keywords_path) + '.*-*.ac'):
+            if path != snapshot_path:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
 
-    def filter(self, message):
+    def filter(self, message: str) -> tuple[str, list[str]]:
         """使用 Aho-Corasick 自动机过滤消息中的敏感词，替换为指定字符"""
-        message_lower = message.lower()  # 将消息转换为小写以进行不区分大小写的匹配
-        result = list(message)  # 将消息转化为字符列表，以便进行替换
-        sensitive_words = []  # 存储找到的敏感词
+        message_lower = _lower(message)  # 将消息转换为小写以进行不区分大小写的匹配
+        if not self.prefilter.may_contain(message_lower):
+            return message, []
 
-        # 使用 Aho-Corasick 自动机匹配敏感词
-        for end_index, keyword in self.automaton.iter(message_lower):
-            start_index = end_index - len(keyword) + 1
-            sensitive_words.append(keyword)  # 记录找到的敏感词
-            result[start_index:end_index + 1] = [self.repl] * len(keyword)  # 替换为指定符号
+        spans: list[tuple[int, int]] = []  # 命中区间 [start, end)，相互重叠或相邻的区间会被合并
+        sensitive_words: dict[str, None] = {}  # 存储找到的敏感词，按首次命中顺序去重
 
-        return ''.join(result), sensitive_words  # 返回过滤后的文本和命中的敏感词
+        # 使用 Aho-Corasick 自动机匹配敏感词，命中按结束位置递增给出
+        for end_index, length in self.automaton.iter(message_lower):
+            start_index = end_index - length + 1
+            sensitive_words[message_lower[start_index:end_index + 1]] = None  # 记录找到的敏感词
+            _merge_span(spans, start_index, end_index + 1)
 
+        # 返回过滤后的文本和命中的敏感词
+        return _mask_spans(message, spans, self.repl, self.repl_cache), list(sensitive_words)
+
+    def find_hits(self, message: str) -> list[tuple[int, int, str]]:
+        """只返回命中列表 [(start, end, keyword)]，不生成过滤后的文本"""
+        message_lower = _lower(message)
+        if not self.prefilter.may_contain(message_lower):
+            return []
+        return [
+            (end_index - length + 1, end_index + 1, message_lower[end_index - length + 1:end_index + 1])
+            for end_index, length in self.automaton.iter(message_lower)
+        ]
+
+    def contains_sensitive(self, message: str) -> bool:
+        """判断消息是否包含敏感词，遇到第一个命中立即返回"""
+        message_lower = message.lower()
+        if not self.prefilter.may_contain(message_lower):
+            return False
+        for _ in self.automaton.iter(message_lower):
+            return True
+        return False
+
+
+class NaiveFilter:
+    """基于单个正则交替表达式的敏感词过滤器"""
+
+    def __init__(self, repl: str = "*", keywords_path: str | None = None) -> None:
+        """
+        初始化过滤器:
+        - repl: 用于替换敏感词的符号，默认为 '*'
+        - keywords_path: 敏感词库文件路径，默认为全局的 keyword_path
+        """
+        self.repl = repl  # 替换符号
+        self.keywords_path = keywords_path or keyword_path  # 敏感词库路径
+        self.repl_cache = _repl_table(repl)  # 预生成的替换串，供 _mask_spans 查表
+        self.pattern: re.Pattern[str] | None = None  # 编译后的正则表达式，词库为空时为 None
+        self.max_length = 0  # 最长敏感词的长度
+        self.parse()  # 编译正则表达式
+
+    def parse(self) -> None:
+        """从文件中加载敏感词库，编译为一个按长度降序排列的交替表达式"""
+        keywords = set(_load_keywords(self.keywords_path))
+        self.max_length = max(map(len, keywords), default=0)  # 最长敏感词的长度
+        self.prefilter = BigramPrefilter(keywords)  # 无命中文本的快速预检
+
+        if keywords:
+            # 长词优先，保证同一位置匹配到最长的敏感词
+            ordered = sorted(keywords, key=len, reverse=True)
+            self.pattern = regex.compile('|'.join(re.escape(keyword) for keyword in ordered))
+
+    def filter(self, message: str) -> tuple[str, list[str]]:
+        """对消息只扫描一次，替换所有命中的敏感词"""
+        if self.pattern is None:
+            return message, []
+
+        message_lower = _lower(message)
+        if not self.prefilter.may_contain(message_lower):
+            return message, []
+
+        spans: list[tuple[int, int]] = []  # 交替表达式的命中天然按起点递增且互不重叠
+        sensitive_words: dict[str, None] = {}  # 按首次命中顺序去重
+        for match in self.pattern.finditer(message_lower):
+            spans.append(match.span())
+            sensitive_words[match.group()] = None
+
+        return _mask_spans(message, spans, self.repl, self.repl_cache), list(sensitive_words)
+
+    def find_hits(self, message: str) -> list[tuple[int, int, str]]:
+        """只返回命中列表 [(start, end, keyword)]，不生成过滤后的文本"""
+        message_lower = _lower(message)
+        if self.pattern is None or not self.prefilter.may_contain(message_lower):
+            return []
+        return [(*match.span(), match.group()) for match in self.pattern.finditer(message_lower)]
+
+    def contains_sensitive(self, message: str) -> bool:
+        """判断消息是否包含敏感词，遇到第一个命中立即返回"""
+        message_lower = message.lower()
+        if self.pattern is None or not self.prefilter.may_contain(message_lower):
+            return False
+        return self.pattern.search(message_lower) is not None
+
+
+# 两种过滤器提供相同的 filter / find_hits / contains_sensitive 接口
+Filter = Union[ACAutomaton, NaiveFilter]
 
 # 其他函数保持不变
-from collections import defaultdict
-import re
 
 # 创建过滤器的函数
-def create_filter(filter_type="AC", repl="*"):
+def create_filter(filter_type: str = "AC", repl: str = "*", keywords_path: str | None = None) -> Filter:
     """根据过滤器类型创建并返回相应的过滤器实例"""
-    if filter_type == "Naive":
-        return NaiveFilter(repl)
-    elif filter_type == "BS":
-        return BSFilter(repl)
+    if filter_type == "Naive" or filter_type == "BS":
+        # BS 与 Naive 共用同一个预编译的交替表达式，每条消息只扫描一次
+        return NaiveFilter(repl, keywords_path)
     elif filter_type == "DFA" or filter_type == "AC":
-        return ACAutomaton(repl)
+        return ACAutomaton(repl, keywords_path)
     else:
         raise ValueError("未知类型: choose from 'Naive', 'BS', or 'AC'.")
 
-# 用于过滤文本的外部接口
-def filter_text(text, filter_type="AC", repl="*"):
-    """调用适当的过滤器来过滤输入文本"""
-    if not os.path.exists(keyword_path):
+@functools.lru_cache(maxsize=8)
+def _get_filter(filter_type: str, keywords_path: str, repl: str, mtime: int) -> Filter:
+    """
+    返回已构建好的过滤器实例，避免每次调用都重新读取词库并构建自动机。
+    mtime 仅作为缓存键的一部分：词库文件被修改后会重新构建。
+    """
+    return create_filter(filter_type, repl, keywords_path)
+
+def _keyword_mtime() -> int:
+    """返回词库文件的修改时间，keyword_check_interval 内最多 stat 一次"""
+    global _keyword_stat
+    now = time.monotonic()
+    if _keyword_stat is not None:
+        path, checked_at, mtime = _keyword_stat
+        if path == keyword_path and now - checked_at < keyword_check_interval:
+            return mtime
+
+    try:
+        mtime = os.stat(keyword_path).st_mtime_ns
+    except FileNotFoundError:
+        _keyword_stat = None
         raise FileNotFoundError(f"敏感词库文件未找到: {keyword_path}")
 
-    gfw = create_filter(filter_type, repl)  # 创建指定类型的过滤器
+    _keyword_stat = (keyword_path, now, mtime)
+    return mtime
+
+def get_filter(filter_type: str = "AC", repl: str = "*") -> Filter:
+    """返回当前词库对应的缓存过滤器，词库文件修改后自动重建"""
+    return _get_filter(filter_type, keyword_path, repl, _keyword_mtime())
+
+# 用于过滤文本的外部接口
+def filter_text(text: str, filter_type: str = "AC", repl: str = "*") -> tuple[str, list[str]]:
+    """调用适当的过滤器来过滤输入文本"""
+    gfw = get_filter(filter_type, repl)  # 获取缓存的过滤器
 
     return gfw.filter(text)  # 返回过滤后的文本和敏感词列表
 
 # 主逻辑部分
-def collect_sensitive_words_and_filter(text, filter_type="AC", repl="*"):
+def collect_sensitive_words_and_filter(text: str, filter_type: str = "AC", repl: str = "*") -> tuple[list[str], str]:
     """收集触发的敏感词并过滤消息"""
-    print(f"开始过滤，输入文本: {text}")  # 调试语句
     try:
         filtered_text, sensitive_words = filter_text(text, filter_type=filter_type, repl=repl)
-        print(f"过滤后的文本: {filtered_text}")  # 调试语句
-        print(f"命中的敏感词: {sensitive_words}")  # 调试语句
-        return sensitive_words, filtered_text
     except FileNotFoundError as e:
-        print(f"敏感词过滤完成: {e}")
+        logger.warning("敏感词过滤完成: %s", e)
         return [], text
 
-def process_document(input_text):
+    # 仅在 DEBUG 级别下格式化完整文本，生产日志级别不产生任何开销
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("过滤后的文本: %s", filtered_text)
+        logger.debug("命中的敏感词: %s", sensitive_words)
+    return sensitive_words, filtered_text
+
+def collect_sensitive_words(text: str, filter_type: str = "AC") -> list[str]:
+    """只收集触发的敏感词，不生成过滤后的文本"""
+    try:
+        hits = get_filter(filter_type).find_hits(text)
+        sensitive_words = list(dict.fromkeys(keyword for _, _, keyword in hits))  # 按首次命中顺序去重
+    except FileNotFoundError as e:
+        logger.warning("敏感词过滤完成: %s", e)
+        return []
+
+    logger.debug("命中的敏感词: %s", sensitive_words)
+    return sensitive_words
+
+class StreamFilter:
+    """
+    对分块到达的文本做增量过滤，内存占用只与块大小有关。
+    每次保留末尾 max_length - 1 个字符留到下一块一起扫描，跨块的敏感词同样能命中。
+    """
+
+    def __init__(self, filter_type: str = "AC", repl: str = "*") -> None:
+        """
+        初始化增量过滤器:
+        - filter_type: 过滤器类型，与 create_filter 相同
+        - repl: 用于替换敏感词的符号，默认为 '*'
+        词库文件缺失时与 collect_sensitive_words_and_filter 一致：原样输出，不报告敏感词。
+        """
+        try:
+            self.gfw: Filter | None = get_filter(filter_type, repl)
+        except FileNotFoundError as e:
+            logger.warning("敏感词过滤完成: %s", e)
+            self.gfw = None
+        self.pending = ''  # 尚未输出的文本尾部
+        self.masked = 0  # pending 开头已被上一块命中覆盖、需要屏蔽的字符数
+        self.sensitive_words: dict[str, None] = {}  # 存储找到的敏感词，按首次命中顺序去重
+
+    def feed(self, chunk: str) -> str:
+        """输入一块文本，返回其中已经可以确定的过滤结果"""
+        return self._scan(self.pending + chunk, final=False)
+
+    def flush(self) -> str:
+        """输入结束，返回剩余文本的过滤结果"""
+        return self._scan(self.pending, final=True)
+
+    def _scan(self, text: str, final: bool) -> str:
+        if self.gfw is None:
+            self.pending = ''
+            return text
+
+        # cut 之前的字符不会再被后续块中的命中覆盖，可以输出
+        keep = 0 if final else max(self.gfw.max_length - 1, 0)
+        cut = max(len(text) - keep, 0)
+        spans = [(0, self.masked)] if self.masked else []
+
+        for start_index, end_index, keyword in self.gfw.find_hits(text):
+            if start_index >= cut:
+                continue  # 完全落在保留的尾部，下一块会重新命中
+            self.sensitive_words[keyword] = None
+            _merge_span(spans, start_index, end_index)
+
+        filtered_text = _mask_spans(text, spans, self.gfw.repl, self.gfw.repl_cache)
+        self.pending = text[cut:]
+        self.masked = max(spans[-1][1] - cut, 0) if spans else 0
+        return filtered_text[:cut]
+
+def process_document(input_text: str) -> tuple[list[str], str]:
     """处理文档，过滤每一页的敏感词并记录触发的敏感词"""
-    processed_text = ""  # 存储处理后的文本
-    pages = input_text.split('\n\n')  # 简单的分页模拟逻辑，按双换行符分隔页
-    all_sensitive_words = []  # 存储所有页面的敏感词
+    # 自动机不依赖分页状态，且敏感词不含换行符，因此直接对整篇文档只匹配一次
+    all_sensitive_words, filtered_text = collect_sensitive_words_and_filter(input_text)
 
-    for page in pages:
-        sensitive_words, filtered_page = collect_sensitive_words_and_filter(page)  # 过滤每一页
-        all_sensitive_words.extend(sensitive_words)  # 汇总所有页的敏感词
-        processed_text += filtered_page + '\n'  # 拼接过滤后的页面文本
+    # 页面按双换行符分隔，处理后以单个换行符拼接，与逐页处理的输出保持一致
+    processed_text = filtered_text.replace('\n\n', '\n') + '\n'
 
     return all_sensitive_words, processed_text  # 返回敏感词列表和处理后的文档
 
 # main 函数用于测试
-def main():
+def main() -> None:
     input_text = """
     Page1: This is a test document. It contains some sensitive words.
     Page2: Another page with content that may trigger the filter.
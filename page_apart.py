@@ -1,5 +1,8 @@
 import re
 
+# 匹配 'Page' 后跟随数字的格式，模块加载时编译一次
+_PAGE_RE = re.compile(r'(Page\s*\d+)')
+
 def page_apart(text):
     """
     根据 'Page' 和页码数字的格式分段文本，并在 'Page' 后添加冒号和换行符。
@@ -10,8 +13,12 @@ def page_apart(text):
     返回:
         list: 分段后的文本列表，每个元素代表一个页面的内容。
     """
+    # 不含 'Page' 的文本不可能有页码，直接返回，省去正则扫描
+    if 'Page' not in text:
+        return []
+
     # 使用正则表达式分割文本，匹配 'Page' 后跟随数字的格式
-    pages = re.split(r'(Page\s*\d+)', text)
+    pages = _PAGE_RE.split(text)
     result = []
 
     for i in range(1, len(pages), 2):
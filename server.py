@@ -1,16 +1,101 @@
 import os
+import codecs
 import tempfile
 import json
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, UploadFile, File, Response, HTTPException, Body, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from typing import Optional
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
 
 # 导入敏感词过滤模块
-from filter import collect_sensitive_words_and_filter
+from filter import StreamFilter, collect_sensitive_words, collect_sensitive_words_and_filter, get_filter
+
+logger = logging.getLogger(__name__)
+
+# 上传文件每次读取的字节数
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# 过滤结果超过该字节数后由内存转存到磁盘临时文件
+SPOOL_MAX_SIZE = 1024 * 1024
+
+# 请求体的最大字节数，超过时返回 413，可通过环境变量 MAX_BODY_SIZE 调整
+MAX_BODY_SIZE = int(os.getenv("MAX_BODY_SIZE", 10 * 1024 * 1024))
+
+
+async def iter_upload_text(file: UploadFile):
+    """
+    分块读取上传文件并增量解码为 UTF-8 文本，跨块的多字节字符会被正确拼接。
+    无法解码时抛出 UnicodeDecodeError。
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        yield decoder.decode(chunk)
+    yield decoder.decode(b'', final=True)
+
+
+class BodySizeLimitMiddleware:
+    """
+    限制请求体大小：声明的 Content-Length 超限时直接返回 413，
+    未声明长度（分块传输）时边读取边计数，超限即中止读取。
+    """
+
+    def __init__(self, app, max_body_size: int):
+        self.app = app
+        self.max_body_size = max_body_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_body_size:
+            response = ORJSONResponse({"detail": "请求体过大"}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_size:
+                    raise HTTPException(status_code=413, detail="请求体过大")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+def iter_spooled_file(spooled):
+    """分块读取临时文件中的内容，读取完毕或连接中断后关闭临时文件"""
+    with spooled:
+        while chunk := spooled.read(UPLOAD_CHUNK_SIZE):
+            yield chunk
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    应用启动时预先构建敏感词自动机，
+    第一个请求无需再承担读取词库和构建自动机的开销。
+    """
+    try:
+        get_filter()
+    except FileNotFoundError as e:
+        logger.warning("敏感词库预加载失败: %s", e)
+    yield
 
 # 创建 FastAPI 应用实例
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+
+# 限制请求体大小，先于 CORS 注册，使 413 响应同样带有跨域头
+app.add_middleware(BodySizeLimitMiddleware, max_body_size=MAX_BODY_SIZE)
 
 # CORS 配置（跨域资源共享）
 app.add_middleware(
@@ -35,7 +120,9 @@ async def root():
     return {"message": "Hello World"}
 
 
-@app.post("/check")
+# /check 的响应只含 str / bool / list[str]，使用 orjson 序列化；
+# /filter 返回任意 JSON 解析结果（可能含超出 64 位的整数，orjson 无法编码），保留默认的 JSONResponse
+@app.post("/check", response_class=ORJSONResponse)
 async def check_compliance(
     request: Request,  # 用于处理原始请求体
     payload: Optional[TextPayload] = Body(None),  # JSON 请求体
@@ -47,13 +134,17 @@ async def check_compliance(
     """
     # 优先处理 JSON 请求体
     if payload and payload.text:
-        text_to_check = payload.text
-    # 如果有文件上传，读取文件内容
+        sensitive_words = await run_in_threadpool(collect_sensitive_words, payload.text)
+    # 如果有文件上传，分块读取并增量扫描，不把整个文件读入内存
     elif file:
+        scanner = StreamFilter()
         try:
-            text_to_check = (await file.read()).decode('utf-8')
+            async for chunk in iter_upload_text(file):
+                await run_in_threadpool(scanner.feed, chunk)
         except UnicodeDecodeError:
             raise HTTPException(status_code=400, detail="文件无法解码为 UTF-8 文本")
+        await run_in_threadpool(scanner.flush)
+        sensitive_words = list(scanner.sensitive_words)
     # 如果是纯文本（text/plain 请求体）
     else:
         # 尝试读取 request body 中的纯文本内容
@@ -61,16 +152,16 @@ async def check_compliance(
             text_to_check = (await request.body()).decode('utf-8')
         except UnicodeDecodeError:
             raise HTTPException(status_code=400, detail="纯文本无法解码为 UTF-8")
-
-    # 调用 collect_sensitive_words_and_filter 函数，检测敏感词
-    sensitive_words, _ = collect_sensitive_words_and_filter(text_to_check)
+        # 调用 collect_sensitive_words 函数，只检测敏感词，不生成过滤后的文本
+        # 匹配是 CPU 密集型操作，放到线程池中执行，避免阻塞事件循环中的其他请求
+        sensitive_words = await run_in_threadpool(collect_sensitive_words, text_to_check)
 
     # 如果存在敏感词，返回不合规状态和敏感词列表
     if sensitive_words:
         return {
             "compliant": False,  # 表示文本不合规
             "message": "文本包含敏感词",  # 错误信息
-            "sensitive_words": sensitive_words  # 返回的敏感词列表
+            "sensitive_words": sensitive_words  # 返回的敏感词列表（已去重）
         }
     else:
         # 如果没有敏感词，返回合规状态
@@ -93,12 +184,20 @@ async def filter_text(
     # 优先处理 JSON 请求体
     if payload and payload.text:
         text_to_check = payload.text
-    # 如果有文件上传，读取文件内容
+    # 如果有文件上传，边读取边过滤，以纯文本流的方式返回过滤后的文本（不按 JSON 解析）
     elif file:
+        # 过滤结果先写入临时文件：开始输出后无法再返回 400，且上传文件在响应发送前就会被关闭
+        output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        scanner = StreamFilter()
         try:
-            text_to_check = (await file.read()).decode('utf-8')
+            async for chunk in iter_upload_text(file):
+                output.write((await run_in_threadpool(scanner.feed, chunk)).encode('utf-8'))
         except UnicodeDecodeError:
+            output.close()
             raise HTTPException(status_code=400, detail="文件无法解码为 UTF-8 文本")
+        output.write((await run_in_threadpool(scanner.flush)).encode('utf-8'))
+        output.seek(0)
+        return StreamingResponse(iter_spooled_file(output), media_type="text/plain; charset=utf-8")
     # 如果是纯文本（text/plain 请求体）
     else:
         # 尝试读取 request body 中的纯文本内容
@@ -107,8 +206,8 @@ async def filter_text(
         except UnicodeDecodeError:
             raise HTTPException(status_code=400, detail="纯文本无法解码为 UTF-8")
 
-    # 调用 collect_sensitive_words_and_filter 函数，进行敏感词过滤并替换
-    _, filtered_text = collect_sensitive_words_and_filter(text_to_check)
+    # 调用 collect_sensitive_words_and_filter 函数，进行敏感词过滤并替换（在线程池中执行）
+    _, filtered_text = await run_in_threadpool(collect_sensitive_words_and_filter, text_to_check)
 
     def parse_json_to_dict(json_string):
         """
@@ -125,7 +224,7 @@ async def filter_text(
             parsed_dict = json.loads(json_string)
             return parsed_dict
         except json.JSONDecodeError as e:
-            print(f"Error parsing JSON: {e}")
+            logger.warning("Error parsing JSON: %s", e)
             return None
 
     # 返回过滤后的文本
@@ -134,8 +233,12 @@ async def filter_text(
 if __name__ == "__main__":
     import uvicorn
 
+    # 匹配是 CPU 密集型任务，默认每个 CPU 核心启动一个工作进程，可通过环境变量 WORKERS 调整
+    workers = int(os.getenv("WORKERS", os.cpu_count() or 1))
+
     try:
         print("启动成功")
-        uvicorn.run(app, host="0.0.0.0", port=3005)
+        # 多进程模式下需要以导入字符串的形式传入应用；loop="auto" 在安装了 uvloop 时自动使用它
+        uvicorn.run("server:app", host="0.0.0.0", port=3005, workers=workers, loop="auto", http="httptools")
     except Exception as e:
         print(f"启动失败：{e}")